@@ -21,6 +21,7 @@ class Settings:
 
     ### Segmentation or aggregation
     gene_exclude_pattern: str | None = "negcontrol.*|blank.*|antisense.*|unassigned.*|deprecated.*|intergenic.*"
+    baysor_parallelism: int = 1  # number of Baysor processes running concurrently when there is no backend
 
     def __init__(self):
         self.parallelization_backend = os.environ.get("SOPA_PARALLELIZATION_BACKEND", None)
@@ -22,11 +22,11 @@ def cellpose(
     min_area: int = typer.Option(0, help="Minimum area (in pixels^2) for a cell to be considered as valid"),
     clip_limit: float = typer.Option(
         0.2,
-        help="Parameter for skimage.exposure.equalize_adapthist (applied before running cellpose)",
+        help="Parameter for skimage.exposure.equalize_adapthist (applied before running cellpose, but computed with OpenCV)",
     ),
     clahe_kernel_size: int = typer.Option(
         None,
-        help="Parameter for skimage.exposure.equalize_adapthist (applied before running cellpose)",
+        help="Parameter for skimage.exposure.equalize_adapthist (applied before running cellpose, but computed with OpenCV)",
     ),
     gaussian_sigma: float = typer.Option(
         1, help="Parameter for scipy gaussian_filter (applied before running cellpose)"
@@ -35,6 +35,10 @@ def cellpose(
         default=None,
         help="Index of the patch on which cellpose should be run. NB: the number of patches is `len(sdata['image_patches'])`",
     ),
+    patches_batch_size: int = typer.Option(
+        1,
+        help="Number of same-shape patches given at once to the segmentation method when running on all patches (`--patch-index` not provided)",
+    ),
     cache_dir_name: str = typer.Option(
         default=None,
         help="Name of the temporary cellpose directory inside which we will store each individual patch segmentation. By default, uses the `cellpose_boundaries` directory",
@@ -68,6 +72,7 @@ def cellpose(
         gaussian_sigma,
         patch_index,
         cache_dir_name,
+        patches_batch_size,
         diameter=diameter,
         flow_threshold=flow_threshold,
         cellprob_threshold=cellprob_threshold,
@@ -92,11 +97,11 @@ def generic_staining(
     min_area: int = typer.Option(0, help="Minimum area (in pixels^2) for a cell to be considered as valid"),
     clip_limit: float = typer.Option(
         0.2,
-        help="Parameter for skimage.exposure.equalize_adapthist (applied before running the segmentation method)",
+        help="Parameter for skimage.exposure.equalize_adapthist (applied before running the segmentation method, but computed with OpenCV)",
     ),
     clahe_kernel_size: int = typer.Option(
         None,
-        help="Parameter for skimage.exposure.equalize_adapthist (applied before running cellpose)",
+        help="Parameter for skimage.exposure.equalize_adapthist (applied before running cellpose, but computed with OpenCV)",
     ),
     gaussian_sigma: float = typer.Option(
         1,
@@ -106,6 +111,10 @@ def generic_staining(
         default=None,
         help="Index of the patch on which the segmentation method should be run. NB: the number of patches is `len(sdata['image_patches'])`",
     ),
+    patches_batch_size: int = typer.Option(
+        1,
+        help="Number of same-shape patches given at once to the segmentation method when running on all patches (`--patch-index` not provided)",
+    ),
     cache_dir_name: str = typer.Option(
         default=None,
         help="Name of the temporary the segmentation method directory inside which we will store each individual patch segmentation. By default, uses the `<method_name>` directory",
@@ -139,6 +148,7 @@ def generic_staining(
         gaussian_sigma,
         patch_index,
         cache_dir_name,
+        patches_batch_size,
         **method_kwargs,
     )
 
@@ -154,6 +164,7 @@ def _run_staining_segmentation(
     gaussian_sigma: float,
     patch_index: int | None,
     cache_dir_name: str | None,
+    patches_batch_size: int,
     **method_kwargs: int,
 ):
     from sopa.io.standardize import read_zarr_standardized
@@ -184,6 +195,7 @@ def _run_staining_segmentation(
             key_added=key_added,
             cache_dir_name=cache_dir_name,
             delete_cache=delete_cache,
+            patches_batch_size=patches_batch_size,
         )
         _log_whether_to_resolve(patch_index, delete_cache=delete_cache)
         return
@@ -314,3 +326,90 @@ def tissue(
     sdata = read_zarr_standardized(sdata_path)
 
     sopa.segmentation.tissue(sdata, image_key=image_key, level=level, mode=mode, **kwargs)
+
+
+@app_segmentation.command()
+def serve(
+    sdata_path: str = typer.Argument(help=SDATA_HELPER),
+    socket_path: str = typer.Option(help="Path of the unix socket on which the server listens"),
+):
+    """Open the SpatialData object once, and run the `sopa` commands received on a unix socket (sent via `sopa segmentation serve-call`).
+
+    Usage:
+        Run `sopa segmentation serve <sdata_path> --socket-path sopa.sock` in the background, and then, e.g., `sopa segmentation serve-call --socket-path sopa.sock segmentation cellpose <sdata_path> --patch-index 0 ...`. Commands on the same `sdata_path` reuse the opened object instead of reading the zarr directory again. Commands are run one after the other.
+    """
+    import json
+    import logging
+    import os
+    import socketserver
+    from pathlib import Path
+
+    try:  # recent typer versions bundle their own click, whose exceptions derive from `TyperException`
+        from typer import TyperException as CliException
+    except ImportError:
+        from click import ClickException as CliException
+
+    from sopa.io.standardize import read_zarr_standardized
+
+    from .app import app
+
+    log = logging.getLogger(__name__)
+
+    read_zarr_standardized(sdata_path, keep_open=True)
+
+    class _CommandHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            request = json.loads(self.rfile.readline())
+            args = request["args"]
+            log.info(f"Running `sopa {' '.join(args)}` in {request['cwd']}")
+
+            server_cwd = os.getcwd()
+            try:
+                os.chdir(request["cwd"])  # relative paths are relative to the `serve-call` directory
+                result = app(args, standalone_mode=False)
+                exit_code = result if isinstance(result, int) else 0  # click returns the code of `typer.Exit`
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else int(e.code is not None)
+            except CliException as e:  # e.g. usage errors
+                if hasattr(e, "show"):
+                    e.show()
+                exit_code = e.exit_code
+            except Exception:
+                log.exception(f"Error when running `sopa {' '.join(args)}`")
+                exit_code = 1
+            finally:
+                os.chdir(server_cwd)
+
+            self.wfile.write((json.dumps({"exit_code": exit_code}) + "\n").encode())
+
+    socket_path: Path = Path(socket_path).resolve()
+    socket_path.unlink(missing_ok=True)
+
+    with socketserver.UnixStreamServer(str(socket_path), _CommandHandler) as server:
+        log.info(f"Listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            socket_path.unlink(missing_ok=True)
+
+
+@app_segmentation.command(context_settings={"allow_extra_args": True, "ignore_unknown_options": True})
+def serve_call(
+    ctx: typer.Context,
+    socket_path: str = typer.Option(help="Path of the unix socket on which `sopa segmentation serve` listens"),
+):
+    """Send a `sopa` command to a running `sopa segmentation serve`, e.g. `sopa segmentation serve-call --socket-path sopa.sock segmentation cellpose <sdata_path> ...`"""
+    import json
+    import os
+    import socket
+    import sys
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall((json.dumps({"args": ctx.args, "cwd": os.getcwd()}) + "\n").encode())
+
+        response = json.loads(client.makefile().readline())
+
+    sys.exit(response["exit_code"])
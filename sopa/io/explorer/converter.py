@@ -1,6 +1,8 @@
 import json
 import logging
+from functools import partial
 from pathlib import Path
+from typing import Callable
 
 import geopandas as gpd
 from anndata import AnnData
@@ -22,6 +24,7 @@ from . import (
     write_transcripts,
 )
 from ._constants import FileNames, experiment_dict
+from .table import _prepare_cell_categories
 from .utils import explorer_file_path
 
 log = logging.getLogger(__name__)
@@ -109,6 +112,8 @@ def write(
 
     image_key, _ = get_spatial_image(sdata, key=image_key, return_key=True)
 
+    write_functions: list[Callable] = []  # independent writes, run concurrently before the image
+
     ### Saving table / cell categories / gene counts
     if table_key in sdata.tables:
         adata: AnnData = sdata.tables[table_key]
@@ -122,11 +127,10 @@ def write(
         geo_df = sdata[shapes_key]
 
         if _should_save(mode, "c"):
-            write_gene_counts(path, adata, layer=layer)
+            write_functions.append(partial(write_gene_counts, path, adata, layer=layer))
         if _should_save(mode, "o"):
-            write_cell_categories(path, adata)
-        if save_h5ad:
-            adata.write_h5ad(path / FileNames.H5AD)
+            _prepare_cell_categories(adata)  # updates adata.obs inplace before the concurrent writes
+            write_functions.append(partial(write_cell_categories, path, adata))
 
     ### Saving cell boundaries
     if shapes_key is None:
@@ -138,9 +142,13 @@ def write(
         geo_df = to_intrinsic(sdata, geo_df, image_key)
 
         if table_key in sdata.tables:
-            geo_df = geo_df.loc[adata.obs[adata.uns[ATTRS_KEY]["instance_key"]]]
+            indexer = geo_df.index.get_indexer(adata.obs[adata.uns[ATTRS_KEY]["instance_key"]].values)
+            assert (indexer >= 0).all(), f"Some cells from the table are not in sdata['{shapes_key}']"
+            geo_df = geo_df.iloc[indexer]
 
-        write_polygons(path, geo_df.geometry, polygon_max_vertices, pixel_size=pixel_size)
+        write_functions.append(
+            partial(write_polygons, path, geo_df.geometry, polygon_max_vertices, pixel_size=pixel_size)
+        )
 
     ### Saving transcripts
     df = None
@@ -151,10 +159,15 @@ def write(
         gene_column = gene_column or get_feature_key(df)
         if gene_column is not None:
             df = to_intrinsic(sdata, df, image_key)
-            write_transcripts(path, df, gene_column, pixel_size=pixel_size)
+            write_functions.append(partial(write_transcripts, path, df, gene_column, pixel_size=pixel_size))
         else:
             log.warning("The argument 'gene_column' has to be provided to save the transcripts")
 
+    _run_concurrently(write_functions)
+
+    if save_h5ad and table_key in sdata.tables:
+        adata.write_h5ad(path / FileNames.H5AD)  # not concurrent, as it may convert adata.obs columns inplace
+
     ### Saving image
     if _should_save(mode, "i") and not _use_symlink(path, sdata, "morphology*"):
         write_image(
@@ -173,6 +186,18 @@ def write(
     log.info(f"You can open the experiment with 'open {path / FileNames.METADATA}'")
 
 
+def _run_concurrently(functions: list[Callable]):
+    """Run I/O-bound functions in threads, and raise the first error (if any)"""
+    if len(functions) <= 1:
+        return [f() for f in functions]
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=len(functions)) as executor:
+        futures = [executor.submit(f) for f in functions]
+        return [future.result() for future in futures]
+
+
 def _use_symlink(path: Path, sdata: SpatialData, pattern: str) -> bool:
     """Try using the Xenium output files when existing to avoid re-generating large files."""
     if SopaAttrs.XENIUM_OUTPUT_PATH not in sdata.attrs:
@@ -85,8 +85,7 @@ def write_cell_categories(path: str, adata: AnnData, is_dir: bool = True) -> Non
     """
     path = explorer_file_path(path, FileNames.CELL_CATEGORIES, is_dir)
 
-    adata.strings_to_categoricals()
-    cat_columns = [name for name, cat in adata.obs.dtypes.items() if cat == "category"]
+    cat_columns = _prepare_cell_categories(adata)
 
     log.info(f"Writing {len(cat_columns)} cell categories: {', '.join(cat_columns)}")
 
@@ -98,11 +97,6 @@ def write_cell_categories(path: str, adata: AnnData, is_dir: bool = True) -> Non
         cell_groups = g.create_group("cell_groups")
 
         for i, name in enumerate(cat_columns):
-            if adata.obs[name].isna().any():
-                NA = "NA"
-                log.warning(f"Column {name} has nan values. They will be displayed as '{NA}'")
-                adata.obs[name] = adata.obs[name].cat.add_categories(NA).fillna(NA)
-
             categories = list(adata.obs[name].cat.categories)
             ATTRS["grouping_names"].append(name)
             ATTRS["group_names"].append(categories)
@@ -112,6 +106,20 @@ def write_cell_categories(path: str, adata: AnnData, is_dir: bool = True) -> Non
         cell_groups.attrs.put(ATTRS)
 
 
+def _prepare_cell_categories(adata: AnnData) -> list[str]:
+    """Convert the string columns of `adata.obs` to categories (inplace), fill their NaN values, and return their names"""
+    adata.strings_to_categoricals()
+    cat_columns = [name for name, cat in adata.obs.dtypes.items() if cat == "category"]
+
+    for name in cat_columns:
+        if adata.obs[name].isna().any():
+            NA = "NA"
+            log.warning(f"Column {name} has nan values. They will be displayed as '{NA}'")
+            adata.obs[name] = adata.obs[name].cat.add_categories(NA).fillna(NA)
+
+    return cat_columns
+
+
 def save_column_csv(path: str, adata: AnnData, key: str):
     """Save one column of the AnnData object as a CSV that can be open interactively in the explorer, under the "cell" panel.
 
@@ -35,9 +35,20 @@ def sanity_check(sdata: SpatialData, delete_table: bool = False):
             del sdata.tables[SopaKeys.TABLE]
 
 
-def read_zarr_standardized(path: str) -> SpatialData:
+_OPENED_SDATA: dict[str, SpatialData] = {}  # used by `sopa segmentation serve` to avoid re-reading the same zarr
+
+
+def read_zarr_standardized(path: str, keep_open: bool = False) -> SpatialData:
+    key = str(Path(path).resolve())
+    if key in _OPENED_SDATA:
+        return _OPENED_SDATA[key]
+
     sdata = spatialdata.read_zarr(path)
     sanity_check(sdata)
+
+    if keep_open:
+        _OPENED_SDATA[key] = sdata
+
     return sdata
 
 
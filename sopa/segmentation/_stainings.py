@@ -1,5 +1,6 @@
 import logging
-from functools import partial
+from functools import lru_cache, partial
+from math import ceil
 from pathlib import Path
 from typing import Callable, Iterable
 
@@ -9,10 +10,10 @@ import pandas as pd
 import spatialdata
 from scipy.ndimage import gaussian_filter
 from shapely.geometry import Polygon, box
-from skimage import exposure
 from spatialdata import SpatialData
 from spatialdata.models import ShapesModel
 from spatialdata.transformations import get_transformation
+from tqdm import tqdm
 
 from .. import settings
 from .._constants import SopaKeys
@@ -33,6 +34,7 @@ class StainingSegmentation:
         clip_limit: float = 0.2,
         clahe_kernel_size: int | Iterable[int] | None = None,
         gaussian_sigma: float = 1,
+        patches_batch_size: int = 1,
     ):
         """Generalized staining-based segmentation class
 
@@ -42,9 +44,10 @@ class StainingSegmentation:
             channels: One or a list of channel names used for segmentation. If only one channel is provided, the image given to the `method` will be of shape `(1, Y, X)`. None assumes RGB image.
             image_key: Optional key of `sdata` containing the image (no needed if there is only one image)
             min_area: Minimum area (in pixels^2) for a cell to be kept
-            clip_limit: Parameter for skimage.exposure.equalize_adapthist (applied before running cellpose)
-            clahe_kernel_size: Parameter for skimage.exposure.equalize_adapthist (applied before running cellpose)
+            clip_limit: Parameter for skimage.exposure.equalize_adapthist (applied before running cellpose, but computed with OpenCV)
+            clahe_kernel_size: Parameter for skimage.exposure.equalize_adapthist (applied before running cellpose, but computed with OpenCV)
             gaussian_sigma: Parameter for scipy gaussian_filter (applied before running cellpose)
+            patches_batch_size: Number of patches given at once to the `method` when running without parallelization backend. If `>1`, the `method` must also accept a stack of same-shape images `(N, C, Y, X)`, and return masks of shape `(N, Y, X)`.
         """
         assert SopaKeys.PATCHES in sdata.shapes, "Run `sopa.make_image_patches` before running segmentation"
 
@@ -55,6 +58,7 @@ class StainingSegmentation:
         self.clip_limit = clip_limit
         self.clahe_kernel_size = clahe_kernel_size
         self.gaussian_sigma = gaussian_sigma
+        self.patches_batch_size = patches_batch_size
 
         self.image_key, self.image = get_spatial_image(sdata, key=image_key, return_key=True)
 
@@ -78,6 +82,10 @@ class StainingSegmentation:
         Returns:
             A list of cells, represented as polygons
         """
+        image, bounds = self._preprocess_patch(patch)
+        return self._mask_to_cells(self.method(image), bounds)
+
+    def _preprocess_patch(self, patch: Polygon) -> tuple[np.ndarray, list[int]]:
         bounds = [int(x) for x in patch.bounds]
 
         image = self.image.sel(
@@ -93,22 +101,16 @@ class StainingSegmentation:
         if self.gaussian_sigma > 0:
             image = np.stack([gaussian_filter(c, sigma=self.gaussian_sigma) for c in image])
         if self.clip_limit > 0:
-            image = np.stack(
-                [
-                    exposure.equalize_adapthist(
-                        c,
-                        clip_limit=self.clip_limit,
-                        kernel_size=self.clahe_kernel_size,
-                    )
-                    for c in image
-                ]
-            )
+            image = np.stack([_equalize_adapthist(c, self.clip_limit, self.clahe_kernel_size) for c in image])
 
         if patch.area < box(*bounds).area:
             mask = shapes.rasterize(patch, image.shape[1:], bounds)
             image = _channels_average_within_mask(image, mask)
 
-        cells = shapes.vectorize(self.method(image))
+        return image, bounds
+
+    def _mask_to_cells(self, mask: np.ndarray, bounds: list[int]) -> gpd.GeoDataFrame:
+        cells = shapes.vectorize(mask)
         cells.geometry = cells.translate(*bounds[:2])
 
         return cells[cells.area >= self.min_area] if self.min_area > 0 else cells
@@ -140,6 +142,10 @@ class StainingSegmentation:
             patch_dir: Directory inside which segmentation results will be saved
             recover: If `True`, the function will not run segmentation on already-segmented patches
         """
+        if settings.parallelization_backend is None and self.patches_batch_size > 1:
+            self._write_patches_cells_batched(patch_dir, recover)
+            return
+
         functions = [
             partial(self.write_patch_cells, patch_dir, patch_index, recover)
             for patch_index in range(len(self.patches_gdf))
@@ -153,6 +159,35 @@ class StainingSegmentation:
 
         settings._run_with_backend(functions)
 
+    def _write_patches_cells_batched(self, patch_dir: str, recover: bool = False):
+        """Same as `write_patches_cells`, but patches of the same shape are given by batch to the `method`"""
+        patch_dir: Path = Path(patch_dir)
+        patch_dir.mkdir(parents=True, exist_ok=True)
+
+        batches: dict[tuple[int, ...], list[tuple[int, np.ndarray, list[int]]]] = {}  # pending patches, by shape
+
+        for patch_index in tqdm(range(len(self.patches_gdf))):
+            if recover and (patch_dir / f"{patch_index}.parquet").exists():
+                continue
+
+            image, bounds = self._preprocess_patch(self.patches_gdf.geometry[patch_index])
+
+            batch = batches.setdefault(image.shape, [])
+            batch.append((patch_index, image, bounds))
+
+            if len(batch) == self.patches_batch_size:
+                self._write_batch_cells(patch_dir, batches.pop(image.shape))
+
+        for batch in batches.values():
+            self._write_batch_cells(patch_dir, batch)
+
+    def _write_batch_cells(self, patch_dir: Path, batch: list[tuple[int, np.ndarray, list[int]]]):
+        masks = self.method(np.stack([image for _, image, _ in batch]))
+        assert masks.shape[0] == len(batch), f"Expected {len(batch)} masks, got an array of shape {masks.shape}"
+
+        for (patch_index, _, bounds), mask in zip(batch, masks):
+            self._mask_to_cells(mask, bounds).to_parquet(patch_dir / f"{patch_index}.parquet")
+
     @classmethod
     def read_patches_cells(cls, patch_dir: str | list[str]) -> gpd.GeoDataFrame:
         """Read all patch segmentation results after running `write_patch_cells` on all patches
@@ -195,3 +230,65 @@ def _channels_average_within_mask(image: np.ndarray, mask: np.ndarray) -> np.nda
     channels_average = (image * mask).sum(axis=(1, 2)) / mask.sum().clip(1)
 
     return image * mask + (1 - mask) * channels_average[:, None, None]
+
+
+def _equalize_adapthist(
+    channel: np.ndarray, clip_limit: float, kernel_size: int | Iterable[int] | None = None
+) -> np.ndarray:
+    """OpenCV CLAHE, using the same arguments (and similar output) as `skimage.exposure.equalize_adapthist`.
+    If `cucim` is installed and a GPU is available, it runs `cucim.skimage.exposure.equalize_adapthist` instead.
+
+    Args:
+        channel: A 2D image of integer dtype
+        clip_limit: Clipping limit, normalized between 0 and 1
+        kernel_size: Shape `(y, x)` of the contextual regions. By default, 1/8 of the image height and width.
+
+    Returns:
+        The equalized image, as `float32` values between 0 and 1
+    """
+    if _has_cucim_gpu():
+        import cupy as cp
+        from cucim.skimage import exposure
+
+        channel = exposure.equalize_adapthist(cp.asarray(channel), kernel_size=kernel_size, clip_limit=clip_limit)
+        return cp.asnumpy(channel).astype(np.float32, copy=False)
+
+    import cv2
+
+    vmin, vmax = channel.min(), channel.max()
+    if vmin == vmax:
+        return np.zeros(channel.shape, dtype=np.float32)
+
+    channel = ((channel - vmin) * (255 / (vmax - vmin))).astype(np.uint8)  # skimage also uses 256 histogram bins
+
+    if kernel_size is None:
+        kernel_size = [max(size // 8, 1) for size in channel.shape]
+    else:
+        kernel_size = [kernel_size, kernel_size] if isinstance(kernel_size, int) else list(kernel_size)
+
+    # OpenCV splits the image in `tileGridSize` tiles, so we pad it (as skimage does) to have tiles of size `kernel_size`
+    shape = channel.shape
+    padded_shape = [max(ceil(size / kernel), 1) * kernel for size, kernel in zip(shape, kernel_size)]
+    channel = np.pad(channel, [(0, padded - size) for size, padded in zip(shape, padded_shape)], mode="reflect")
+    tile_grid_size = tuple(padded // kernel for padded, kernel in zip(padded_shape[::-1], kernel_size[::-1]))
+
+    # OpenCV clips each tile histogram at `clipLimit * tile_area / 256`, while skimage clips at `clip_limit * tile_area`
+    clahe = cv2.createCLAHE(clipLimit=clip_limit * 256, tileGridSize=tile_grid_size)
+    channel = clahe.apply(channel)[: shape[0], : shape[1]].astype(np.float32)
+
+    vmin, vmax = channel.min(), channel.max()
+    return (channel - vmin) / (vmax - vmin) if vmax > vmin else np.zeros_like(channel)
+
+
+@lru_cache(maxsize=1)
+def _has_cucim_gpu() -> bool:
+    try:
+        import cucim.skimage.exposure  # noqa: F401
+        import cupy as cp
+    except ImportError:
+        return False
+
+    try:
+        return cp.cuda.runtime.getDeviceCount() > 0
+    except cp.cuda.runtime.CUDARuntimeError:
+        return False
@@ -1,5 +1,6 @@
 import logging
-from functools import partial
+import shlex
+from functools import lru_cache, partial
 from pathlib import Path
 
 from spatialdata import SpatialData
@@ -76,7 +77,10 @@ def baysor(
         else patches_dirs
     )
 
-    settings._run_with_backend([partial(baysor_patch, patch_dir) for patch_dir in remaining_patches_dirs])
+    if settings.parallelization_backend is None and settings.baysor_parallelism > 1 and remaining_patches_dirs:
+        _run_patches_concurrently(baysor_patch, remaining_patches_dirs, settings.baysor_parallelism)
+    else:
+        settings._run_with_backend([partial(baysor_patch, patch_dir) for patch_dir in remaining_patches_dirs])
 
     if force:
         patches_dirs = [patch_dir for patch_dir in patches_dirs if (patch_dir / "segmentation_counts.loom").exists()]
@@ -94,7 +98,7 @@ def baysor(
 class BaysorPatch:
     def __init__(
         self,
-        baysor_command: str,
+        baysor_command: list[str],
         config: dict | str,
         force: bool = False,
         capture_output: bool = True,
@@ -109,11 +113,13 @@ class BaysorPatch:
 
         import subprocess
 
-        result = subprocess.run(self.baysor_command, cwd=patch_dir, shell=True, capture_output=self.capture_output)
+        result = subprocess.run(self.baysor_command, cwd=patch_dir, capture_output=self.capture_output)
 
         if result.returncode != 0 or not (patch_dir / "segmentation_counts.loom").exists():
             if self.force:
-                log.warning(f"Baysor error on patch {patch_dir.resolve()} with command `{self.baysor_command}`")
+                log.warning(
+                    f"Baysor error on patch {patch_dir.resolve()} with command `{shlex.join(self.baysor_command)}`"
+                )
                 return
             raise subprocess.CalledProcessError(
                 returncode=result.returncode,
@@ -123,27 +129,49 @@ class BaysorPatch:
             )
 
 
-def _get_baysor_command(prior_shapes_key: str | None) -> str:
+def _run_patches_concurrently(baysor_patch: BaysorPatch, patches_dirs: list[Path], max_workers: int):
+    """Run Baysor on multiple patches, with at most `max_workers` Baysor processes at the same time.
+
+    Each thread only waits for its Baysor subprocess, and a new patch starts as soon as another one is done.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    from tqdm import tqdm
+
+    log.info(f"Running Baysor on {len(patches_dirs)} patches, with {max_workers} concurrent processes")
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [executor.submit(baysor_patch, patch_dir) for patch_dir in patches_dirs]
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            future.result()
+    except BaseException:
+        executor.shutdown(wait=True, cancel_futures=True)  # don't start the remaining patches
+        raise
+    executor.shutdown()
+
+
+def _get_baysor_command(prior_shapes_key: str | None) -> list[str]:
     baysor_executable_path = _get_baysor_executable_path()
 
     use_polygons_format_argument = _use_polygons_format_argument(baysor_executable_path)
     polygon_format = (
-        "--polygon-format GeometryCollection" if use_polygons_format_argument else "--save-polygons GeoJSON"
+        ["--polygon-format", "GeometryCollection"] if use_polygons_format_argument else ["--save-polygons", "GeoJSON"]
     )  # depends on the version of baysor
 
-    prior_suffix = f" :{prior_shapes_key}" if prior_shapes_key else ""  # use a prior segmentation
+    prior_suffix = [f":{prior_shapes_key}"] if prior_shapes_key else []  # use a prior segmentation
 
-    return f"{baysor_executable_path} run {polygon_format} -c config.toml transcripts.csv" + prior_suffix
+    return [str(baysor_executable_path), "run", *polygon_format, "-c", "config.toml", "transcripts.csv", *prior_suffix]
 
 
+@lru_cache(maxsize=None)
 def _use_polygons_format_argument(baysor_executable_path: str) -> bool:
     import subprocess
 
     from packaging.version import InvalidVersion, Version
 
     result = subprocess.run(
-        f"{baysor_executable_path} run --version",
-        shell=True,
+        [str(baysor_executable_path), "run", "--version"],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         universal_newlines=True,
@@ -156,6 +184,7 @@ def _use_polygons_format_argument(baysor_executable_path: str) -> bool:
         return True
 
 
+@lru_cache(maxsize=None)
 def _get_baysor_executable_path() -> Path | str:
     import shutil
 
@@ -1,3 +1,4 @@
+import logging
 import warnings
 from functools import partial
 from typing import Callable
@@ -8,6 +9,8 @@ from spatialdata import SpatialData
 from ..._constants import SopaKeys
 from ._custom import custom_staining_based
 
+log = logging.getLogger(__name__)
+
 
 def cellpose(
     sdata: SpatialData,
@@ -25,6 +28,8 @@ def cellpose(
     gaussian_sigma: float = 1,
     key_added: str = SopaKeys.CELLPOSE_BOUNDARIES,
     cellpose_model_kwargs: dict | None = None,
+    patches_batch_size: int = 1,
+    tensorrt_engine_path: str | None = None,
     **cellpose_eval_kwargs: int,
 ):
     """Run [Cellpose](https://cellpose.readthedocs.io/en/latest/) segmentation on a SpatialData object, and add a GeoDataFrame containing the cell boundaries.
@@ -46,11 +51,13 @@ def cellpose(
         recover: If `True`, recover the cache from a failed segmentation, and continue.
         flow_threshold: Cellpose `flow_threshold` parameter.
         cellprob_threshold: Cellpose `cellprob_threshold` parameter.
-        clip_limit: Parameter for skimage.exposure.equalize_adapthist (applied before running cellpose)
-        clahe_kernel_size: Parameter for skimage.exposure.equalize_adapthist (applied before running cellpose)
+        clip_limit: Parameter for skimage.exposure.equalize_adapthist (applied before running cellpose, but computed with OpenCV)
+        clahe_kernel_size: Parameter for skimage.exposure.equalize_adapthist (applied before running cellpose, but computed with OpenCV)
         gaussian_sigma: Parameter for scipy gaussian_filter (applied before running cellpose)
         key_added: Name of the shapes element to be added to `sdata`.
-        cellpose_model_kwargs: Dictionary of kwargs to be provided to the `cellpose.models.CellposeModel` object.
+        cellpose_model_kwargs: Dictionary of kwargs to be provided to the `cellpose.models.CellposeModel` object. By default, uses `gpu=True` (Cellpose falls back to the CPU if no GPU is available).
+        patches_batch_size: Number of same-shape patches given at once to Cellpose when running without parallelization backend. On GPU, a value `>1` usually increases the throughput.
+        tensorrt_engine_path: Optional path to a TensorRT engine (`.plan` file) of the Cellpose network. If provided, uses `CellposeModelTRT` instead of the PyTorch model (see `cellpose_patch`).
         **cellpose_eval_kwargs: Kwargs to be provided to `model.eval` (where `model` is a `cellpose.models.CellposeModel` object)
     """
     channels = channels if isinstance(channels, list) else [channels]
@@ -62,6 +69,7 @@ def cellpose(
         flow_threshold=flow_threshold,
         cellprob_threshold=cellprob_threshold,
         cellpose_model_kwargs=cellpose_model_kwargs,
+        tensorrt_engine_path=tensorrt_engine_path,
         **cellpose_eval_kwargs,
     )
 
@@ -81,6 +89,7 @@ def cellpose(
         gaussian_sigma=gaussian_sigma,
         cache_dir_name=key_added,
         key_added=key_added,
+        patches_batch_size=patches_batch_size,
     )
 
 
@@ -90,26 +99,40 @@ def cellpose_patch(
     model_type: str = "cyto3",
     pretrained_model: str | bool = False,
     cellpose_model_kwargs: dict | None = None,
+    tensorrt_engine_path: str | None = None,
     **cellpose_eval_kwargs: int,
 ) -> Callable:
     """Creation of a callable that runs Cellpose segmentation on a patch
 
+    !!! info "TensorRT engine"
+        On NVIDIA GPUs, a TensorRT-compiled (BF16) Cellpose network is faster than the PyTorch one. First, build the engine, e.g.
+        `python -m cellpose.contrib.cellposetrt.trt_build cpsam -o build.plan`, and then provide `tensorrt_engine_path="build.plan"`.
+
     Args:
         diameter: Cellpose diameter parameter
         channels: List of channel names
         model_type: Cellpose model type
         pretrained_model: Path to the pretrained model to be loaded, or `False`
-        cellpose_model_kwargs: Kwargs to be provided to the `cellpose.models.CellposeModel` object
+        cellpose_model_kwargs: Kwargs to be provided to the `cellpose.models.CellposeModel` object. By default, uses `gpu=True`.
+        tensorrt_engine_path: Optional path to a prebuilt TensorRT engine (`.plan` file). If provided, `cellpose.contrib.cellposetrt.CellposeModelTRT` is used instead of the PyTorch model.
         **cellpose_eval_kwargs: Kwargs to be provided to `model.eval` (where `model` is a `cellpose.models.CellposeModel` object)
 
     Returns:
-        A `callable` whose input is an image of shape `(C, Y, X)` and output is a cell mask of shape `(Y, X)`. Each mask value `>0` represent a unique cell ID
+        A `callable` whose input is an image of shape `(C, Y, X)` and output is a cell mask of shape `(Y, X)`. Each mask value `>0` represent a unique cell ID. It also accepts a batch of images of shape `(N, C, Y, X)`, and then returns masks of shape `(N, Y, X)`.
     """
     try:
         from cellpose import models
     except ImportError:
         raise ImportError("To use cellpose, you need its corresponding sopa extra: `pip install 'sopa[cellpose]'`.")
 
+    if tensorrt_engine_path is not None:
+        try:
+            import cellpose.contrib.cellposetrt
+        except ImportError:
+            raise ImportError(
+                "Using a TensorRT engine requires a cellpose version providing `cellpose.contrib.cellposetrt`, and `tensorrt` to be installed."
+            )
+
     def _(
         patch: np.ndarray,
         diameter: float,
@@ -117,16 +140,27 @@ def cellpose_patch(
         model_type: str,
         pretrained_model: str | bool = False,
         cellpose_model_kwargs: dict | None = None,
+        tensorrt_engine_path: str | None = None,
         **cellpose_eval_kwargs: int,
     ):
         warnings.filterwarnings("ignore", message="You are using `torch.load` with `weights_only=False`")
 
         cellpose_model_kwargs = cellpose_model_kwargs or {}
 
-        if pretrained_model:
-            model = models.CellposeModel(pretrained_model=pretrained_model, **cellpose_model_kwargs)
-        else:
-            model = models.Cellpose(model_type=model_type, **cellpose_model_kwargs)
+        def _get_model(**kwargs):
+            if tensorrt_engine_path is not None:
+                return cellpose.contrib.cellposetrt.CellposeModelTRT(
+                    pretrained_model=tensorrt_engine_path, **cellpose_model_kwargs
+                )
+
+            # on GPU (if available), both the network and the flows dynamics run on the same device
+            kwargs = {"gpu": True, **cellpose_model_kwargs, **kwargs}
+            if pretrained_model:
+                return models.CellposeModel(pretrained_model=pretrained_model, **kwargs)
+            return models.Cellpose(model_type=model_type, **kwargs)
+
+        model = _get_model()
+        log.debug(f"Running cellpose on device {getattr(model, 'device', 'unknown')}")
 
         if isinstance(channels, str) or len(channels) == 1:
             channels = [0, 0]  # gray scale
@@ -135,7 +169,25 @@ def cellpose_patch(
         else:
             raise ValueError(f"Provide 1 or 2 channels. Found {len(channels)}")
 
-        mask, *_ = model.eval(patch, diameter=diameter, channels=channels, **cellpose_eval_kwargs)
+        if patch.ndim == 4:  # batch of patches, segmented independently as the planes of a stack
+            cellpose_eval_kwargs = {"z_axis": 0, "channel_axis": 1, "do_3D": False, **cellpose_eval_kwargs}
+
+        import torch
+
+        try:
+            mask, *_ = model.eval(patch, diameter=diameter, channels=channels, **cellpose_eval_kwargs)
+        except torch.cuda.OutOfMemoryError:
+            if tensorrt_engine_path is not None:
+                raise
+            log.warning("GPU out of memory when running cellpose on a patch, running it on CPU instead")
+            torch.cuda.empty_cache()
+
+            model = _get_model(gpu=False)
+            mask, *_ = model.eval(patch, diameter=diameter, channels=channels, **cellpose_eval_kwargs)
+
+        if patch.ndim == 4:  # cellpose squeezes the mask of a single-patch batch
+            mask = mask.reshape(patch.shape[0], *patch.shape[-2:])
+
         return mask
 
     return partial(
@@ -145,5 +197,6 @@ def cellpose_patch(
         model_type=model_type,
         pretrained_model=pretrained_model,
         cellpose_model_kwargs=cellpose_model_kwargs,
+        tensorrt_engine_path=tensorrt_engine_path,
         **cellpose_eval_kwargs,
     )
@@ -21,6 +21,7 @@ def custom_staining_based(
     gaussian_sigma: float = 1,
     cache_dir_name: str = SopaKeys.CUSTOM_BOUNDARIES,
     key_added: str = SopaKeys.CUSTOM_BOUNDARIES,
+    patches_batch_size: int = 1,
 ):
     """Run a generic staining-based segmentation model, and add a GeoDataFrame containing the cell boundaries.
 
@@ -32,11 +33,12 @@ def custom_staining_based(
         min_area: Minimum area of a cell to be considered.
         delete_cache: Whether to delete the cache after segmentation.
         recover: If `True`, recover the cache from a failed segmentation, and continue.
-        clip_limit: Parameter for skimage.exposure.equalize_adapthist (applied before running segmentation)
-        clahe_kernel_size: Parameter for skimage.exposure.equalize_adapthist (applied before running segmentation)
+        clip_limit: Parameter for skimage.exposure.equalize_adapthist (applied before running segmentation, but computed with OpenCV)
+        clahe_kernel_size: Parameter for skimage.exposure.equalize_adapthist (applied before running segmentation, but computed with OpenCV)
         gaussian_sigma: Parameter for scipy gaussian_filter (applied before running segmentation)
         cache_dir_name: Name of the cache directory.
         key_added: Name of the key to be added to `sdata.shapes`.
+        patches_batch_size: Number of same-shape patches given at once to the `method` when running without parallelization backend. If `>1`, the `method` must also accept an input of shape `(N, C, Y, X)` and return masks of shape `(N, Y, X)`.
     """
     temp_dir = get_cache_dir(sdata) / cache_dir_name
 
@@ -49,6 +51,7 @@ def custom_staining_based(
         clip_limit=clip_limit,
         clahe_kernel_size=clahe_kernel_size,
         gaussian_sigma=gaussian_sigma,
+        patches_batch_size=patches_batch_size,
     )
     segmentation.write_patches_cells(temp_dir, recover=recover)
 
@@ -42,8 +42,8 @@ def stardist(
         recover: If `True`, recover the cache from a failed segmentation, and continue.
         prob_thresh: Stardist `prob_thresh` parameter.
         nms_thresh: Stardist `nms_thresh` parameter.
-        clip_limit: Parameter for skimage.exposure.equalize_adapthist (applied before running stardist)
-        clahe_kernel_size: Parameter for skimage.exposure.equalize_adapthist (applied before running stardist)
+        clip_limit: Parameter for skimage.exposure.equalize_adapthist (applied before running stardist, but computed with OpenCV)
+        clahe_kernel_size: Parameter for skimage.exposure.equalize_adapthist (applied before running stardist, but computed with OpenCV)
         gaussian_sigma: Parameter for scipy gaussian_filter (applied before running stardist)
         key_added: Name of the shapes element to be added to `sdata`.
         **stardist_eval_kwargs: Kwargs to be provided to `model.predict_instances` (where `model` is a `stardist.models.StarDist2D` object)
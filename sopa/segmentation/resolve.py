@@ -36,32 +36,55 @@ def solve_conflicts(
     """
     cells = list(cells.geometry) if isinstance(cells, gpd.GeoDataFrame) else list(cells)
     n_cells = len(cells)
-    resolved_indices = np.arange(n_cells)
+    parents = list(range(n_cells))
 
     assert n_cells > 0, "No cells was segmented, cannot continue"
 
     tree = shapely.STRtree(cells)
-    conflicts = tree.query(cells, predicate="intersects")
+    conflicts_i1, conflicts_i2 = tree.query(cells, predicate="intersects")
 
+    # a cell intersects itself. Pairs are kept in both orders: `(b, a)` re-checks `b` once `a` has been merged
+    where_conflict = conflicts_i1 != conflicts_i2
     if patch_indices is not None:
-        conflicts = conflicts[:, patch_indices[conflicts[0]] != patch_indices[conflicts[1]]].T
-    else:
-        conflicts = conflicts[:, conflicts[0] != conflicts[1]].T
+        where_conflict &= patch_indices[conflicts_i1] != patch_indices[conflicts_i2]
+
+    conflicts_i1, conflicts_i2 = conflicts_i1[where_conflict], conflicts_i2[where_conflict]
+
+    cells_array = np.array(cells, dtype=object)
+    areas = list(shapely.area(cells_array))  # also updated with the area of the merged cells
+
+    # the intersection of (a, b) and (b, a) is computed only once
+    pair_keys = np.minimum(conflicts_i1, conflicts_i2) * n_cells + np.maximum(conflicts_i1, conflicts_i2)
+    unique_keys, pair_indices = np.unique(pair_keys, return_inverse=True)
+    pairs_i1, pairs_i2 = unique_keys // n_cells, unique_keys % n_cells
+    intersections = shapely.area(shapely.intersection(cells_array[pairs_i1], cells_array[pairs_i2]))[pair_indices]
+
+    should_merge = intersections >= threshold * np.minimum(np.take(areas, conflicts_i1), np.take(areas, conflicts_i2))
+
+    for i1, i2, merge in tqdm(
+        zip(conflicts_i1, conflicts_i2, should_merge), total=len(conflicts_i1), desc="Resolving conflicts"
+    ):
+        resolved_i1: int = _find_root(parents, i1)
+        resolved_i2: int = _find_root(parents, i2)
+
+        if resolved_i1 == resolved_i2:
+            continue
 
-    for i1, i2 in tqdm(conflicts, desc="Resolving conflicts"):
-        resolved_i1: int = resolved_indices[i1]
-        resolved_i2: int = resolved_indices[i2]
         cell1, cell2 = cells[resolved_i1], cells[resolved_i2]
 
-        intersection = cell1.intersection(cell2).area
-        if intersection >= threshold * min(cell1.area, cell2.area):
+        if resolved_i1 != i1 or resolved_i2 != i2:  # at least one cell was merged, the intersection has to be updated
+            merge = cell1.intersection(cell2).area >= threshold * min(areas[resolved_i1], areas[resolved_i2])
+
+        if merge:
             cell = _ensure_polygon(cell1.union(cell2))
             assert not cell.is_empty, "Merged cell is empty"
 
-            resolved_indices[np.isin(resolved_indices, [resolved_i1, resolved_i2])] = len(cells)
+            parents[resolved_i1] = parents[resolved_i2] = len(cells)
+            parents.append(len(cells))
             cells.append(cell)
+            areas.append(cell.area)
 
-    unique_indices = np.unique(resolved_indices)
+    unique_indices = np.unique([_find_root(parents, i) for i in range(n_cells)])
     unique_cells = gpd.GeoDataFrame(geometry=cells).iloc[unique_indices]
 
     if return_indices:
@@ -70,6 +93,18 @@ def solve_conflicts(
     return unique_cells
 
 
+def _find_root(parents: list[int], index: int) -> int:
+    """Find the index of the resolved cell containing the cell `index` (union-find with path compression)"""
+    root = index
+    while parents[root] != root:
+        root = parents[root]
+
+    while parents[index] != root:
+        parents[index], index = root, parents[index]
+
+    return root
+
+
 def combine(
     sdata: SpatialData,
     elements: list[str | gpd.GeoDataFrame],
@@ -1,30 +1,82 @@
 import logging
+from functools import partial
 from math import ceil, floor
 
 import geopandas as gpd
 import numpy as np
 import shapely
-import shapely.affinity
 from shapely.geometry import GeometryCollection, MultiPolygon, Polygon
 
 log = logging.getLogger(__name__)
 
 
-def _contours(cell_mask: np.ndarray) -> MultiPolygon:
+def _contours(cell_mask: np.ndarray, offset: tuple[int, int] = (0, 0)) -> MultiPolygon:
     """Extract the contours of all cells from a binary mask
 
     Args:
         cell_mask: An array representing a cell: 1 where the cell is, 0 elsewhere
+        offset: Tuple `(x, y)` added to the contours coordinates, e.g. if `cell_mask` is a crop of a larger mask
 
     Returns:
         A shapely MultiPolygon
     """
     import cv2
 
-    contours, _ = cv2.findContours(cell_mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    contours, _ = cv2.findContours(cell_mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE, offset=offset)
     return MultiPolygon([Polygon(contour[:, 0, :]) for contour in contours if contour.shape[0] >= 4])
 
 
+def _relabel_sequential(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Relabel the cells of a mask from `1` to `n_cells` if some ids are missing, using the smallest possible dtype
+
+    Args:
+        mask: A cell mask. Non-null values correspond to cell ids
+
+    Returns:
+        A tuple `(mask, cell_ids)`, where `cell_ids[i]` is the original id of the cell labeled `i + 1` in the new mask
+    """
+    cell_ids = np.flatnonzero(np.bincount(mask.ravel())[1:]) + 1
+
+    if len(cell_ids) == cell_ids[-1]:  # already sequential
+        return mask, cell_ids
+
+    new_labels = np.zeros(cell_ids[-1] + 1, dtype=np.min_scalar_type(len(cell_ids)))
+    new_labels[cell_ids] = np.arange(1, len(cell_ids) + 1)
+
+    return new_labels[mask], cell_ids
+
+
+def _cells_contours(mask: np.ndarray) -> list[MultiPolygon]:
+    """Extract the contours of each cell of a mask, only looking at the bounding box of each cell
+
+    Args:
+        mask: A cell mask. Non-null values correspond to cell ids
+
+    Returns:
+        A list of MultiPolygon, one per cell id from `1` to `mask.max()` (empty if the id is missing from the mask)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from scipy.ndimage import find_objects
+
+    bboxes = find_objects(mask)
+
+    with ThreadPoolExecutor() as executor:  # OpenCV and GEOS release the GIL
+        return list(executor.map(partial(_cell_contours, mask), range(1, len(bboxes) + 1), bboxes))
+
+
+def _cell_contours(mask: np.ndarray, cell_id: int, bbox: tuple[slice, slice] | None) -> MultiPolygon:
+    if bbox is None:
+        return MultiPolygon()
+
+    y_slice, x_slice = bbox
+
+    cell_mask = np.zeros((y_slice.stop - y_slice.start + 2, x_slice.stop - x_slice.start + 2), dtype=np.uint8)
+    np.equal(mask[bbox], cell_id, out=cell_mask[1:-1, 1:-1].view(bool))  # 1-pixel padding keeps the full-mask contours
+
+    return _contours(cell_mask, offset=(x_slice.start - 1, y_slice.start - 1))
+
+
 def _ensure_polygon(cell: Polygon | MultiPolygon | GeometryCollection) -> Polygon:
     """Ensures that the provided cell becomes a Polygon
 
@@ -34,55 +86,107 @@ def _ensure_polygon(cell: Polygon | MultiPolygon | GeometryCollection) -> Polygo
     Returns:
         The shape as a Polygon, or an empty Polygon if the cell was invalid
     """
-    cell = shapely.make_valid(cell)
+    cells = np.empty(1, dtype=object)
+    cells[0] = cell
+    return _ensure_polygons(cells)[0]
+
+
+def _ensure_polygons(cells: np.ndarray) -> np.ndarray:
+    """Ensures that the provided cells become Polygons (vectorized version of `_ensure_polygon`)
+
+    - A Polygon is kept, without its holes.
+    - For a MultiPolygon, the largest Polygon is kept.
+    - For a GeometryCollection, the largest Polygon is kept. If it has no Polygon, the largest Polygon of its MultiPolygons is kept.
+
+    Args:
+        cells: Array of shapely geometries
+
+    Returns:
+        Array of Polygons. A cell is an empty Polygon if it was invalid
+    """
+    cells = shapely.make_valid(cells)
+    type_ids = shapely.get_type_id(cells)
 
-    if isinstance(cell, Polygon):
-        if cell.interiors:
-            cell = Polygon(list(cell.exterior.coords))
-        return cell
+    is_polygon = type_ids == shapely.GeometryType.POLYGON
+    has_holes = is_polygon & (shapely.get_num_interior_rings(cells) > 0)
+    cells[has_holes] = shapely.polygons(shapely.get_exterior_ring(cells[has_holes]))
 
-    if isinstance(cell, MultiPolygon):
-        return max(cell.geoms, key=lambda polygon: polygon.area)
+    is_multi = (type_ids == shapely.GeometryType.MULTIPOLYGON) | (type_ids == shapely.GeometryType.GEOMETRYCOLLECTION)
+    unknown = ~(is_polygon | is_multi)
 
-    if isinstance(cell, GeometryCollection):
-        geoms = [geom for geom in cell.geoms if isinstance(geom, Polygon)]
+    if unknown.any():
+        log.warning(f"Removing {unknown.sum()} cell(s) of unknown type (e.g., {type(cells[unknown][0])})")
+        cells[unknown] = Polygon()
 
-        if geoms:
-            return max(geoms, key=lambda polygon: polygon.area)
+    multi_indices = np.flatnonzero(is_multi)
+    if not len(multi_indices):
+        return cells
 
-        geoms = [geom for geom in cell.geoms if isinstance(geom, MultiPolygon)]
-        geoms = [polygon for multi_polygon in geoms for polygon in multi_polygon.geoms]
+    parts, parts_index = shapely.get_parts(cells[multi_indices], return_index=True)
+    parts_type_ids = shapely.get_type_id(parts)
 
-        if geoms:
-            return max(geoms, key=lambda polygon: polygon.area)
+    largest, found = _largest_polygon_by_index(parts, parts_index, parts_type_ids, len(multi_indices))
 
-        log.warning(f"Removing cell of type {type(cell)} as it contains no Polygon geometry")
-        return Polygon()
+    if not found.all():  # GeometryCollection without Polygon: looking at its MultiPolygons
+        is_nested = (parts_type_ids == shapely.GeometryType.MULTIPOLYGON) & ~found[parts_index]
+        sub_parts, sub_index = shapely.get_parts(parts[is_nested], return_index=True)
+        sub_index = parts_index[is_nested][sub_index]
 
-    log.warning(f"Removing cell of unknown type {type(cell)}")
-    return Polygon()
+        nested_largest, nested_found = _largest_polygon_by_index(
+            sub_parts, sub_index, shapely.get_type_id(sub_parts), len(multi_indices)
+        )
+        largest[nested_found], found = nested_largest[nested_found], found | nested_found
+
+    if not found.all():
+        log.warning(f"Removing {(~found).sum()} cell(s) as they contain no Polygon geometry")
+        largest[~found] = Polygon()
+
+    cells[multi_indices] = largest
+    return cells
+
+
+def _largest_polygon_by_index(
+    parts: np.ndarray, parts_index: np.ndarray, parts_type_ids: np.ndarray, n: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """For each index from `0` to `n - 1`, find the largest Polygon among the parts with that index"""
+    largest, found = np.empty(n, dtype=object), np.zeros(n, dtype=bool)
+
+    is_polygon = parts_type_ids == shapely.GeometryType.POLYGON
+    parts, parts_index = parts[is_polygon], parts_index[is_polygon]
+
+    order = np.lexsort((shapely.area(parts), parts_index))  # sorted by index, then by area
+    parts, parts_index = parts[order], parts_index[order]
+
+    is_largest = np.append(parts_index[1:] != parts_index[:-1], True)[: len(parts)]  # last part of each index
+
+    largest[parts_index[is_largest]] = parts[is_largest]
+    found[parts_index[is_largest]] = True
+
+    return largest, found
 
 
 def to_valid_polygons(geo_df: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
-    geo_df.geometry = geo_df.geometry.map(_ensure_polygon)
+    geo_df.geometry = _ensure_polygons(np.asarray(geo_df.geometry))
     return geo_df[~geo_df.is_empty]
 
 
-def _smoothen_cell(cell: MultiPolygon, smooth_radius: float, tolerance: float) -> Polygon:
-    """Smoothen a cell polygon
+def _smoothen_cells(cells: np.ndarray, smooth_radius: float, tolerance: float) -> np.ndarray:
+    """Smoothen cell polygons (vectorized over all cells)
 
     Args:
-        cell_id: ID of the cell to vectorize
-        smooth_radius: radius used to smooth the cell polygon
-        tolerance: tolerance used to simplify the cell polygon
+        cells: Array of shapely MultiPolygon, one per cell
+        smooth_radius: radius used to smooth the cell polygons
+        tolerance: tolerance used to simplify the cell polygons
 
     Returns:
-        Shapely polygon representing the cell, or an empty Polygon if the cell was empty after smoothing
+        Array of shapely polygons representing the cells. A cell is an empty Polygon if it was empty after smoothing
     """
-    cell = cell.buffer(-smooth_radius).buffer(2 * smooth_radius).buffer(-smooth_radius)
-    cell = cell.simplify(tolerance)
+    cells = shapely.buffer(cells, -smooth_radius, quad_segs=16)
+    cells = shapely.buffer(cells, 2 * smooth_radius, quad_segs=16)
+    cells = shapely.buffer(cells, -smooth_radius, quad_segs=16)
+    cells = shapely.simplify(cells, tolerance)
 
-    return _ensure_polygon(cell)
+    return _ensure_polygons(cells)
 
 
 def _default_tolerance(mean_radius: float) -> float:
@@ -114,20 +218,21 @@ def vectorize(mask: np.ndarray, tolerance: float | None = None, smooth_radius_ra
         log.warning("No cell was returned by the segmentation")
         return gpd.GeoDataFrame(geometry=[])
 
-    cells = gpd.GeoDataFrame(
-        geometry=[_contours((mask == cell_id).astype("uint8")) for cell_id in range(1, max_cells + 1)]
-    )
+    mask, cell_ids = _relabel_sequential(mask)
 
-    mean_radius = np.sqrt(cells.area / np.pi).mean()
+    cells = np.empty(len(cell_ids), dtype=object)
+    cells[:] = _cells_contours(mask)
+
+    mean_radius = np.sqrt(shapely.area(cells) / np.pi).mean()
     smooth_radius = mean_radius * smooth_radius_ratio
 
     if tolerance is None:
         tolerance = _default_tolerance(mean_radius)
 
-    cells.geometry = cells.geometry.map(lambda cell: _smoothen_cell(cell, smooth_radius, tolerance))
-    cells = cells[~cells.is_empty]
+    cells = _smoothen_cells(cells, smooth_radius, tolerance)
+    is_valid = ~shapely.is_empty(cells)
 
-    return cells
+    return gpd.GeoDataFrame(geometry=cells[is_valid], index=cell_ids[is_valid] - 1)
 
 
 def pixel_outer_bounds(bounds: tuple[int, int, int, int]) -> tuple[int, int, int, int]:
@@ -149,13 +254,12 @@ def rasterize(cell: Polygon | MultiPolygon, shape: tuple[int, int], xy_min: tupl
 
     xmin, ymin, xmax, ymax = [xy_min[0], xy_min[1], xy_min[0] + shape[1], xy_min[1] + shape[0]]
 
-    cell_translated = shapely.affinity.translate(cell, -xmin, -ymin)
-    geoms = cell_translated.geoms if isinstance(cell_translated, MultiPolygon) else [cell_translated]
+    geoms = cell.geoms if isinstance(cell, MultiPolygon) else [cell]
 
-    rasterized_image = np.zeros((ymax - ymin, xmax - xmin), dtype=np.int8)
+    rasterized_image = np.zeros((ymax - ymin, xmax - xmin), dtype=np.uint8)
 
-    for geom in geoms:
-        coords = np.array(geom.exterior.coords)[None, :].astype(np.int32)
+    for geom in geoms:  # one call per polygon, as cv2.fillPoly uses an even-odd rule on overlapping contours
+        coords = (shapely.get_coordinates(geom.exterior) - [xmin, ymin])[None, :].astype(np.int32)
         cv2.fillPoly(rasterized_image, coords, color=1)
 
     return rasterized_image
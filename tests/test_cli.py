@@ -0,0 +1,70 @@
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import sopa
+from sopa.io import standardize
+from sopa.io.standardize import read_zarr_standardized
+
+SOPA_COMMAND = [sys.executable, "-c", "from sopa.main import app; app()"]
+
+
+@pytest.fixture
+def sdata_path(tmp_path: Path) -> Path:
+    sdata = sopa.io.toy_dataset(length=200)
+    sopa.make_image_patches(sdata, patch_width=120, patch_overlap=20)
+
+    sdata.write(tmp_path / "sdata.zarr")
+    return tmp_path / "sdata.zarr"
+
+
+def test_read_zarr_standardized_keep_open(sdata_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(standardize, "_OPENED_SDATA", {})
+    monkeypatch.chdir(sdata_path.parent)
+
+    assert read_zarr_standardized("sdata.zarr") is not read_zarr_standardized("sdata.zarr")
+
+    sdata = read_zarr_standardized("sdata.zarr", keep_open=True)
+    assert read_zarr_standardized(str(sdata_path)) is sdata
+
+
+def test_serve_call(sdata_path: Path, tmp_path: Path):
+    server_dir, other_dir = tmp_path / "server", tmp_path / "other"
+    server_dir.mkdir()
+    other_dir.mkdir()
+
+    socket_path = tmp_path / "sopa.sock"
+    server = subprocess.Popen(
+        [*SOPA_COMMAND, "segmentation", "serve", str(sdata_path), "--socket-path", str(socket_path)], cwd=server_dir
+    )
+
+    def serve_call(*args: str, cwd: Path) -> int:
+        command = [*SOPA_COMMAND, "segmentation", "serve-call", "--socket-path", str(socket_path), *args]
+        return subprocess.run(command, cwd=cwd).returncode
+
+    try:
+        for _ in range(120):
+            if socket_path.exists() or server.poll() is not None:
+                break
+            time.sleep(0.5)
+        assert socket_path.exists(), "The server did not start"
+
+        args = ["segmentation", "generic-staining", "sdata.zarr", "--method-name", "dummy_method", "--channels", "DAPI"]
+
+        # relative paths are resolved from the serve-call directory
+        assert serve_call(*args, "--patch-index", "0", cwd=tmp_path) == 0
+        assert (sdata_path / ".sopa_cache" / "dummy_method" / "0.parquet").exists()
+
+        assert serve_call(*args, "--patch-index", "1", cwd=other_dir) != 0
+        assert not (sdata_path / ".sopa_cache" / "dummy_method" / "1.parquet").exists()
+
+        assert serve_call(*args, "--bad-opt", cwd=tmp_path) == 2  # usage error
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait(timeout=30)
+
+    assert not socket_path.exists()
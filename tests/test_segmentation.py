@@ -1,11 +1,19 @@
+import sys
+from types import ModuleType
+
 import numpy as np
+import pytest
 import shapely
 from geopandas.testing import assert_geodataframe_equal
 from shapely import MultiPolygon
 
 import sopa
 from sopa._constants import SopaKeys
-from sopa.segmentation._stainings import _channels_average_within_mask
+from sopa.segmentation import _stainings
+from sopa.segmentation._stainings import (
+    _channels_average_within_mask,
+    _equalize_adapthist,
+)
 
 
 def test_channels_average_within_mask():
@@ -22,6 +30,45 @@ def test_channels_average_within_mask():
     assert (_channels_average_within_mask(image, mask) == expected).all()
 
 
+@pytest.mark.parametrize("kernel_size", [None, 50])
+def test_equalize_adapthist(kernel_size: int | None):
+    from skimage import data, exposure
+
+    image = data.coins()[:303, :382]  # shape not divisible by the kernel size
+
+    expected = exposure.equalize_adapthist(image, clip_limit=0.2, kernel_size=kernel_size)
+    equalized = _equalize_adapthist(image, clip_limit=0.2, kernel_size=kernel_size)
+
+    assert equalized.shape == image.shape
+    assert np.abs(equalized - expected).max() < 0.03
+
+
+@pytest.mark.parametrize("has_cucim_gpu", [False, True])
+def test_equalize_adapthist_backend(monkeypatch: pytest.MonkeyPatch, has_cucim_gpu: bool):
+    from skimage import data, exposure
+
+    # fake cupy / cucim modules, running skimage on CPU
+    cupy, cucim, cucim_skimage = ModuleType("cupy"), ModuleType("cucim"), ModuleType("cucim.skimage")
+    cupy.asarray, cupy.asnumpy = np.asarray, np.asarray
+    cucim.skimage, cucim_skimage.exposure = cucim_skimage, exposure
+    for name, module in [("cupy", cupy), ("cucim", cucim), ("cucim.skimage", cucim_skimage)]:
+        monkeypatch.setitem(sys.modules, name, module)
+
+    monkeypatch.setattr(_stainings, "_has_cucim_gpu", lambda: has_cucim_gpu)
+
+    image = data.coins()[:303, :382]
+
+    expected = exposure.equalize_adapthist(image, clip_limit=0.2)
+    equalized = _stainings._equalize_adapthist(image, clip_limit=0.2)
+
+    assert equalized.dtype == np.float32
+    if has_cucim_gpu:
+        assert np.allclose(equalized, expected)
+    else:
+        assert not np.allclose(equalized, expected)  # OpenCV approximation
+        assert np.abs(equalized - expected).max() < 0.03
+
+
 def test_cellpose_segmentation():
     sdata = sopa.io.toy_dataset(length=500)
 
@@ -44,6 +91,31 @@ def test_cellpose_segmentation():
     sopa.settings.parallelization_backend = None
 
 
+def test_batched_staining_segmentation():
+    sdata = sopa.io.toy_dataset(length=500)
+
+    sopa.make_image_patches(sdata, patch_width=300)
+
+    sopa.settings.parallelization_backend = None
+
+    batch_sizes = []
+
+    def batch_method(images: np.ndarray) -> np.ndarray:
+        batch_sizes.append(len(images))
+
+        masks = np.zeros((images.shape[0], *images.shape[2:]), dtype=int)
+        masks[:, 10:-10, 10:-10] = 1
+        return masks
+
+    sopa.segmentation.custom_staining_based(sdata, sopa.segmentation.methods.dummy_method(), "DAPI", key_added="cells1")
+    sopa.segmentation.custom_staining_based(sdata, batch_method, "DAPI", key_added="cells2", patches_batch_size=3)
+
+    assert 1 in batch_sizes  # at least one single-patch batch
+    assert sum(batch_sizes) == len(sdata[SopaKeys.PATCHES])
+
+    assert_geodataframe_equal(sdata["cells1"], sdata["cells2"])
+
+
 def test_tissue_segmentation():
     sdata = sopa.io.toy_dataset(length=500)
 
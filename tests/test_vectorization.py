@@ -2,10 +2,10 @@ import geopandas as gpd
 import numpy as np
 import pytest
 from shapely.affinity import translate
-from shapely.geometry import Polygon
+from shapely.geometry import GeometryCollection, LineString, MultiPolygon, Polygon, box
 
 from sopa.segmentation import solve_conflicts
-from sopa.segmentation.shapes import vectorize
+from sopa.segmentation.shapes import _relabel_sequential, to_valid_polygons, vectorize
 
 
 @pytest.fixture
@@ -22,6 +22,19 @@ def test_keep_all_cells(mask: np.ndarray, cells: gpd.GeoDataFrame):
     assert len(cells) == mask.max()
 
 
+def test_vectorize_sparse_ids(mask: np.ndarray, cells: gpd.GeoDataFrame):
+    sparse_mask = mask.astype(np.uint32) * 3  # only ids 3, 6, 9, ...
+
+    relabeled_mask, cell_ids = _relabel_sequential(sparse_mask)
+    assert (relabeled_mask == mask).all()
+    assert (cell_ids == 3 * np.arange(1, mask.max() + 1)).all()
+
+    sparse_cells = vectorize(sparse_mask)
+
+    assert (sparse_cells.index == 3 * cells.index + 2).all()  # index is `cell_id - 1`
+    assert all(cell.equals(sparse_cell) for cell, sparse_cell in zip(cells.geometry, sparse_cells.geometry))
+
+
 def test_all_polygons(cells: gpd.GeoDataFrame):
     assert all(isinstance(cell, Polygon) for cell in cells.geometry)
 
@@ -31,3 +44,35 @@ def test_solve_conflict(cells: gpd.GeoDataFrame):
 
     res = solve_conflicts(list(cells.geometry) + other_cells)
     assert all(isinstance(cell, Polygon) for cell in res.geometry)
+
+
+def test_solve_conflict_after_merge():
+    # cell 0 overlaps cells 1 and 2 below the threshold, but above it once cells 1 and 2 are merged
+    cells = [
+        box(0, 0, 10, 10),
+        Polygon([(-50, 0), (4, 0), (4, 10), (60, 10), (60, 30), (-50, 30)]),
+        box(6, 0, 60, 30),
+    ]
+
+    res = solve_conflicts(cells)
+    assert len(res) == 1
+
+
+def test_to_valid_polygons():
+    square = Polygon([(0, 0), (0, 4), (4, 4), (4, 0)])
+    small_square = Polygon([(10, 10), (10, 11), (11, 11), (11, 10)])
+    square_with_hole = Polygon(square.exterior.coords, [[(1, 1), (1, 2), (2, 2), (2, 1)]])
+
+    geo_df = gpd.GeoDataFrame(
+        geometry=[
+            square_with_hole,
+            MultiPolygon([small_square, square]),
+            GeometryCollection([LineString([(0, 0), (1, 1)]), MultiPolygon([small_square, square])]),
+            LineString([(0, 0), (1, 1)]),
+        ]
+    )
+
+    res = to_valid_polygons(geo_df)
+
+    assert len(res) == 3
+    assert all(cell.equals(square) for cell in res.geometry)